@@ -1,13 +1,15 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
-import glob
 import json
-import requests
+import numbers
 import re
-import gspread
-from google.oauth2.service_account import Credentials
+import sqlite3
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 
 # ----------------------------
 # Config
@@ -21,100 +23,361 @@ LINEUP_SLOTS = {
     "FLEX": 1,  # RB/WR/TE
     "D": 1
 }
+FLEX_POSITIONS = ["RB", "WR", "TE"]
+
+CSV_COLUMNS = ["First Name", "Last Name", "Position", "Team", "Opponent", "Salary", "FPPG"]
+PLAYER_COLUMNS = ["name", "position", "team", "opponent", "salary", "fppg"]
+# Slot labels as stored in the leaderboard sheet (RB1, RB2, WR1, ...)
+SLOT_LABELS = [f"{pos}{'' if count==1 else i+1}" for pos, count in LINEUP_SLOTS.items() for i in range(count)]
+# Final per-slot points written back to the leaderboard sheet once a week is over
+SCORE_COLUMNS = [f"{slot}_pts" for slot in SLOT_LABELS]
 
 MANAGERS = ["-","Mariah", "David", "Amos", "AJ", "Danny"]
 SEASON_YEAR = 2025  # update dynamically if needed
 
+def _season_kickoff(year):
+    """Week 1 Thursday kickoff: the Thursday after Labor Day (first Monday of September)"""
+    sept_1 = date(year, 9, 1)
+    labor_day = sept_1 + timedelta(days=(0 - sept_1.weekday()) % 7)
+    return labor_day + timedelta(days=3)
+
+SEASON_START = _season_kickoff(SEASON_YEAR)  # derived so bumping SEASON_YEAR moves it too
+
 SALARIES_FOLDER = "salaries"
+WEEK_FILE_RE = re.compile(r'(\d{4})_week_(\d+)')
 MAPPING_FILE = "mappings/fanduel_to_sleeper.json"
+CACHE_FILE = "player_stats_cache.db"
+
+SLEEPER_STATS_URL = "https://api.sleeper.app/v1/stats/nfl/player/{player_id}?season={season}&season_type=regular&week={week}"
+SLEEPER_MAX_WORKERS = 16
+SLEEPER_TIMEOUT = (1.0, 4.0)  # (connect, read) seconds
 
 # ----------------------------
 # Setup Google Sheets
 # ----------------------------
-# Authorize gspread using service account stored in Streamlit secrets
-creds_dict = st.secrets["gcp_service_account"]
-creds = Credentials.from_service_account_info(
-    creds_dict,
-    scopes=[
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-)
-gc = gspread.authorize(creds)
-
-import gspread
-from google.oauth2.service_account import Credentials
-import streamlit as st
-
-# Create credentials from Streamlit secrets
-creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"])
-gc = gspread.authorize(creds)
-
-# Try opening the workbook
-sh = gc.open("BragginRights")
-print(sh.sheet1.get_all_records())  # just to test
-
+# Authorize gspread using service account stored in Streamlit secrets.
+# Imported lazily so the OAuth handshake only happens once a sheet is touched.
+@st.cache_resource
+def get_gspread_client():
+    """Authorize gspread once per process"""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_info(
+        st.secrets["gcp_service_account"],
+        scopes=[
+            "https://www.googleapis.com/auth/spreadsheets",
+            "https://www.googleapis.com/auth/drive"
+        ]
+    )
+    return gspread.authorize(creds)
 
 # Open workbook and sheets
 WORKBOOK_NAME = "BragginRights"
-sh = gc.open(WORKBOOK_NAME)
-leaderboard_ws = sh.worksheet("leaderboard")
-season_ws = sh.worksheet("season")
+LEADERBOARD_SHEET = "leaderboard"
+SEASON_SHEET = "season"
+SHEET_NAMES = (LEADERBOARD_SHEET, SEASON_SHEET)
+NUMERIC_SHEET_COLUMNS = ["total_points", "weeks_1st", "weeks_2nd", "weeks_3rd", "Placement Points"]
+
+@st.cache_resource
+def _open_sheet():
+    """Open the workbook once per process; by key (no Drive search) when configured"""
+    sheet_key = st.secrets.get("sheet_key")
+    if sheet_key:
+        return get_gspread_client().open_by_key(sheet_key)
+    return get_gspread_client().open(WORKBOOK_NAME)
+
+@st.cache_resource
+def _get_ws(name):
+    """Worksheet handle, looked up once per process"""
+    return _open_sheet().worksheet(name)
 
 # ----------------------------
 # Load FanDuel -> Sleeper mapping
 # ----------------------------
-if os.path.exists(MAPPING_FILE):
+def normalize_name(name):
+    """Case/whitespace-insensitive key for player name lookups"""
+    return str(name).strip().lower()
+
+@st.cache_resource
+def get_mapping():
+    """Load the mapping once per process, keyed on normalized names"""
     with open(MAPPING_FILE, "r") as f:
         mapping = json.load(f)
-else:
-    st.error(f"Mapping file not found: {MAPPING_FILE}")
-    st.stop()
+    return {normalize_name(k): v for k, v in mapping.items()}
 
 # ----------------------------
 # Helper functions
 # ----------------------------
+@st.cache_data(ttl=60, show_spinner=False)
 def load_latest_csv():
-    csv_files = sorted(glob.glob(os.path.join(SALARIES_FOLDER, "*.csv")))
-    if csv_files:
-        latest = csv_files[-1]
-        match = re.search(r'(\d{4})_week_(\d+)', latest)
-        if match:
-            year, week = match.groups()
-            return latest, f"{year}_week_{week}"
+    """Newest salaries CSV by (year, week) in one directory pass"""
+    latest, latest_key = None, None
+    if not os.path.isdir(SALARIES_FOLDER):
+        return None, "unknown_week"
+    with os.scandir(SALARIES_FOLDER) as entries:
+        for entry in entries:
+            match = WEEK_FILE_RE.search(entry.name) if entry.name.endswith(".csv") else None
+            if match:
+                key = (int(match.group(1)), int(match.group(2)))
+                if latest_key is None or key > latest_key:
+                    latest, latest_key = entry.path, key
+    if latest:
+        year, week = latest_key
+        return latest, f"{year}_week_{week}"
     return None, "unknown_week"
 
-def load_csv(file):
-    df = pd.read_csv(file)
+@st.cache_data(show_spinner=False)
+def load_csv(file, mtime):
+    """Parse the FanDuel CSV (mtime busts the cache when the file changes)"""
+    # Only parse the columns we use; low-cardinality text becomes categorical
+    df = pd.read_csv(
+        file,
+        engine="pyarrow",
+        dtype_backend="pyarrow",
+        usecols=CSV_COLUMNS,
+        dtype={"Team": "category", "Opponent": "category", "Salary": "int32", "FPPG": "float32"}
+    )
     df.columns = [c.strip().lower() for c in df.columns]
-    df["name"] = df["first name"] + " " + df["last name"]
-    df = df[["name", "position", "team", "opponent", "salary", "fppg"]]
-    df["position"] = df["position"].replace({"DEF": "D"})
+    # Names load as Arrow-backed strings, so the name/label concatenation runs in Arrow compute kernels
+    df["name"] = df["first name"].str.cat(df["last name"], sep=" ", na_rep="").str.strip()
+    df = df[PLAYER_COLUMNS]
+    df["position"] = df["position"].mask(df["position"].eq("DEF"), "D").astype("category")
     df["fppg"] = df["fppg"].round(2)
+    # Selectbox label, built once per CSV instead of per slot per rerun.
+    # Blank FPPG prints as "nan" like before; pandas 3 keeps NaN missing through astype(str),
+    # which would null out the whole label
+    df["_label"] = df["name"] + " | $" + df["salary"].astype(str) + " | " + df["fppg"].astype(str).fillna("nan") + " FPPG"
     return df
 
+@st.cache_data(show_spinner=False)
+def load_player_index(file, mtime):
+    """selectbox label -> player row dict for O(1) lookups when a player is picked.
+    Keyed on the full label so players sharing a name stay distinct."""
+    df = load_csv(file, mtime)
+    return df.drop_duplicates("_label").set_index("_label")[PLAYER_COLUMNS].to_dict("index")
+
+@st.cache_data(show_spinner=False)
+def derive_filter_domains(file, mtime):
+    """Sidebar filter options as tuples so widget options are stable across reruns"""
+    df = load_csv(file, mtime)
+    return (
+        # Category dtypes already hold the distinct values; no unique() pass needed
+        tuple(df["position"].cat.categories),
+        tuple(df["team"].cat.categories),
+        tuple(df["opponent"].cat.categories),
+        int(df["salary"].min()),
+        int(df["salary"].max())
+    )
+
+@st.cache_resource
+def get_sleeper_session():
+    """Shared session so concurrent fetches reuse keep-alive connections"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    session.headers["User-Agent"] = "bragginrights/1.0"
+    # Pool sized to the thread pool so no worker waits on a connection;
+    # rate limits and transient 5xx are retried with backoff
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount("https://", HTTPAdapter(
+        pool_connections=SLEEPER_MAX_WORKERS,
+        pool_maxsize=SLEEPER_MAX_WORKERS,
+        max_retries=retry
+    ))
+    return session
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_player_points(player_id, season, week):
+    """Fetch points from Sleeper API live (cached for 5 minutes).
+    Failures raise, and st.cache_data never caches a raised call."""
+    url = SLEEPER_STATS_URL.format(player_id=player_id, season=season, week=week)
+    resp = get_sleeper_session().get(url, timeout=SLEEPER_TIMEOUT)
+    resp.raise_for_status()
+    stats = resp.json() or {}
+    return float(stats.get("fantasy_points") or 0)
+
 def get_player_points(player_id, season, week):
-    """Fetch points from Sleeper API live"""
-    url = f"https://api.sleeper.app/v1/stats/nfl/player/{player_id}?season={season}&season_type=regular&week={week}"
+    """Points for one player, or None when Sleeper could not be reached"""
+    import requests
+
     try:
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
-        return resp.json().get("fantasy_points", 0)
-    except:
-        return 0
+        return _fetch_player_points(player_id, season, week)
+    except (requests.RequestException, ValueError):
+        return None
+
+def is_week_final(season, week):
+    """Stats are final once the Wednesday after the week's Monday game arrives"""
+    if season != SEASON_YEAR:
+        return season < SEASON_YEAR
+    return date.today() >= SEASON_START + timedelta(days=7 * (week - 1) + 6)
+
+def _points_db():
+    """Connection to the finalized-points store (created on first use)"""
+    conn = sqlite3.connect(CACHE_FILE, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS player_points ("
+        "pid TEXT, season INTEGER, week INTEGER, pts REAL, PRIMARY KEY (pid, season, week))"
+    )
+    return conn
+
+def load_cached_points(season, week):
+    """Finalized points stored for a week -> {player_id: points}"""
+    with closing(_points_db()) as conn:
+        rows = conn.execute("SELECT pid, pts FROM player_points WHERE season=? AND week=?", (season, week))
+        return dict(rows.fetchall())
+
+def save_cached_points(points, season, week):
+    """Insert new finalized points; SQLite keeps concurrent sessions from clobbering each other"""
+    with closing(_points_db()) as conn, conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO player_points (pid, season, week, pts) VALUES (?, ?, ?, ?)",
+            [(str(pid), season, week, pts) for pid, pts in points.items()]
+        )
+
+def get_points_map(player_ids, season, week):
+    """Fetch points for many players concurrently -> {player_id: points or None}.
+    Finalized weeks are served from / saved to CACHE_FILE."""
+    if not player_ids:
+        return {}
+    final = is_week_final(season, week)
+    cached = load_cached_points(season, week) if final else {}
+    points_map = {}
+    missing = []
+    for pid in player_ids:
+        if str(pid) in cached:
+            points_map[pid] = cached[str(pid)]
+        else:
+            missing.append(pid)
+    if not missing:
+        return points_map
+
+    with ThreadPoolExecutor(max_workers=SLEEPER_MAX_WORKERS) as executor:
+        points = executor.map(lambda pid: get_player_points(pid, season, week), missing)
+        points_map.update(zip(missing, points))
+    if final:
+        # Failed fetches (None) are left out so they are retried next time
+        save_cached_points({pid: points_map[pid] for pid in missing if points_map[pid] is not None}, season, week)
+    return points_map
+
+# ----------------------------
+# Leaderboard builders (cached on their inputs, so widget-only reruns skip the pandas work)
+# ----------------------------
+# Bounded: live points change the inputs every few minutes, so old entries are never hit again
+@st.cache_data(ttl=300, max_entries=8, show_spinner=False)
+def build_weekly_df(wl, managers):
+    """Long (entry, slot, name, points) frame -> one display row per lineup, best first"""
+    wl = wl.copy()
+    wl["display"] = (wl["name"] + " (" + wl["points"].astype(str) + " FPPG)").where(wl["name"] != "", "")
+    weekly_df = wl.pivot(index="entry", columns="slot", values="display").reindex(columns=SLOT_LABELS)
+    weekly_df.insert(0, "Manager", managers)
+    weekly_df["Total"] = wl.groupby("entry")["points"].sum()
+    return weekly_df.sort_values(by="Total", ascending=False)
+
+@st.cache_data(ttl=300, max_entries=8, show_spinner=False)
+def build_season_df(loaded_season_df):
+    """Season sheet + any missing managers, ranked by placement points"""
+    # Add missing managers if needed (collected first, then a single concat)
+    known_managers = set(loaded_season_df['Manager'])
+    new_rows = [
+        {"Manager": m, "weeks_1st": 0, "weeks_2nd": 0, "weeks_3rd": 0, "total_points": 0}
+        for m in MANAGERS if m != "-" and m not in known_managers
+    ]
+    season_df = pd.concat([loaded_season_df, pd.DataFrame(new_rows)], ignore_index=True) if new_rows else loaded_season_df.copy()
+
+    season_df["Placement Points"] = season_df["weeks_1st"]*10 + season_df["weeks_2nd"]*6 + season_df["weeks_3rd"]*3
+    return season_df.sort_values(by="Placement Points", ascending=False)
 
 # ----------------------------
 # Google Sheets helpers
 # ----------------------------
-def load_sheet(ws):
-    """Load sheet as DataFrame"""
-    data = ws.get_all_records()
-    return pd.DataFrame(data)
+def _values_to_df(values):
+    """DataFrame from a raw values grid (first row is the header)"""
+    if not values:
+        return pd.DataFrame()
+    # batchGet trims trailing empty cells, so pad rows back out to the full width
+    width = max(len(row) for row in values)
+    values = [row + [""] * (width - len(row)) for row in values]
+    df = pd.DataFrame(values[1:], columns=values[0])
+    for col in df.columns.intersection(NUMERIC_SHEET_COLUMNS):
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+    return df
 
-def write_sheet(ws, df):
-    """Overwrite entire sheet"""
-    ws.clear()
-    ws.update([df.columns.values.tolist()] + df.values.tolist())
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_sheets(worksheet_names):
+    """Fetch several worksheets in one values.batchGet request -> {name: DataFrame}"""
+    resp = _open_sheet().values_batch_get(ranges=[f"'{name}'" for name in worksheet_names])
+    return {
+        name: _values_to_df(value_range.get("values", []))
+        for name, value_range in zip(worksheet_names, resp["valueRanges"])
+    }
+
+def load_sheet(worksheet_name):
+    """Load sheet as DataFrame (every app sheet comes from one batched, cached read)"""
+    return _fetch_sheets(SHEET_NAMES)[worksheet_name]
+
+def _to_cell(value):
+    """Sheets API CellData for a Python/numpy scalar"""
+    if pd.isna(value):
+        return {"userEnteredValue": {"stringValue": ""}}
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        return {"userEnteredValue": {"numberValue": float(value)}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+def write_sheet(worksheet_name, df):
+    """Overwrite entire sheet (clear + write in a single batch_update request)"""
+    ws = _get_ws(worksheet_name)
+    grid = [df.columns.values.tolist()] + df.values.tolist()
+    ws.spreadsheet.batch_update({"requests": [
+        {"updateCells": {"range": {"sheetId": ws.id}, "fields": "userEnteredValue"}},
+        {"updateCells": {
+            "start": {"sheetId": ws.id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [{"values": [_to_cell(v) for v in row]} for row in grid],
+            "fields": "userEnteredValue"
+        }}
+    ]})
+    _fetch_sheets.clear()
+
+def save_lineup(worksheet_name, df, row):
+    """Append a lineup row in one request; df supplies the current header"""
+    ws = _get_ws(worksheet_name)
+    header = df.columns.tolist()
+    missing = [k for k in row if k not in header]
+    if missing:
+        header += missing
+        ws.update(values=[header], range_name="A1")
+    values = [row.get(c, "") for c in header]
+    ws.append_rows([values], value_input_option="RAW", insert_data_option="INSERT_ROWS")
+    _fetch_sheets.clear()
+
+def write_cells(worksheet_name, df, updates):
+    """Write {row index: {column: value}} into existing rows of the sheet read
+    as df with one values batch request, adding any missing header columns"""
+    from gspread.utils import rowcol_to_a1
+
+    ws = _get_ws(worksheet_name)
+    header = df.columns.tolist()
+    data = []
+    for cells in updates.values():
+        for col in cells:
+            if col not in header:
+                header.append(col)
+                data.append({"range": rowcol_to_a1(1, len(header)), "values": [[col]]})
+    for i, cells in updates.items():
+        for col, value in cells.items():
+            # +2: sheet rows are 1-based and row 1 is the header
+            data.append({"range": rowcol_to_a1(i + 2, header.index(col) + 1), "values": [[value]]})
+    ws.batch_update(data, value_input_option="RAW")
+    _fetch_sheets.clear()
+
+def load_lineup(username, week_key, lineups_df):
+    """Manager's submitted lineup for the week from the loaded sheet, or None"""
+    rows = lineups_df[(lineups_df["week"]==week_key) & (lineups_df["manager"]==username)]
+    if rows.empty:
+        return None
+    return rows.drop(columns="manager").iloc[-1].to_dict()
 
 # ----------------------------
 # Streamlit UI
@@ -129,35 +392,41 @@ if not latest_csv:
     st.error(f"No CSV found in {SALARIES_FOLDER}. Drop the weekly FanDuel CSV there.")
     st.stop()
 
-df = load_csv(latest_csv)
+latest_mtime = os.path.getmtime(latest_csv)
+df = load_csv(latest_csv, latest_mtime)
+player_by_label = load_player_index(latest_csv, latest_mtime)
 
-# Load weekly leaderboard
-leaderboard_df = load_sheet(leaderboard_ws)
-submitted_lineup = leaderboard_df[leaderboard_df['week']==current_week_key].set_index('manager').to_dict('index').get(username)
+# Load weekly leaderboard once per page run to find an already-submitted lineup
+leaderboard_df = load_sheet(LEADERBOARD_SHEET)
+submitted_lineup = load_lineup(username, current_week_key, leaderboard_df)
 
 # ----------------------------
 # Sidebar Filters
 # ----------------------------
 st.sidebar.subheader("Filter Players")
-positions = st.sidebar.multiselect("Positions", df["position"].unique())
-teams = st.sidebar.multiselect("Teams", df["team"].unique())
-opponents = st.sidebar.multiselect("Opponent", df["opponent"].unique())
+pos_opts, team_opts, opp_opts, sal_min, sal_max = derive_filter_domains(latest_csv, latest_mtime)
+positions = st.sidebar.multiselect("Positions", pos_opts)
+teams = st.sidebar.multiselect("Teams", team_opts)
+opponents = st.sidebar.multiselect("Opponent", opp_opts)
 salary_range = st.sidebar.slider(
     "Salary Range",
-    int(df["salary"].min()), int(df["salary"].max()),
-    (0, int(df["salary"].max()))
+    sal_min, sal_max,
+    (0, sal_max)
 )
 
-filtered_df = df.copy()
+# Sidebar mask built once as a NumPy array; shared by the player table and the lineup pools
+filter_mask = np.ones(len(df), dtype=bool)
 if positions:
-    filtered_df = filtered_df[filtered_df["position"].isin(positions)]
+    filter_mask &= df["position"].isin(positions).to_numpy()
 if teams:
-    filtered_df = filtered_df[filtered_df["team"].isin(teams)]
+    filter_mask &= df["team"].isin(teams).to_numpy()
 if opponents:
-    filtered_df = filtered_df[filtered_df["opponent"].isin(opponents)]
-filtered_df = filtered_df[(filtered_df["salary"] >= salary_range[0]) & (filtered_df["salary"] <= salary_range[1])]
+    filter_mask &= df["opponent"].isin(opponents).to_numpy()
+salaries = df["salary"].to_numpy()
+filtered_df = df.iloc[np.flatnonzero(filter_mask & (salaries >= salary_range[0]) & (salaries <= salary_range[1]))]
 st.subheader(f"Available Players — {current_week_key}")
-st.dataframe(filtered_df)
+# Only the visible columns go over the wire; the index is just CSV row numbers
+st.dataframe(filtered_df[PLAYER_COLUMNS], hide_index=True, use_container_width=True)
 
 # ----------------------------
 # Build lineup
@@ -167,39 +436,53 @@ if "lineup" not in st.session_state:
     st.session_state["lineup"] = {}
 
 lineup = st.session_state["lineup"]
-
-if submitted_lineup:
-    st.info("You have already submitted a lineup. You cannot change it.")
-    st.dataframe(pd.DataFrame([submitted_lineup]))
-else:
-    used_players = []
-    for pos, count in LINEUP_SLOTS.items():
-        for i in range(count):
-            label = f"{pos}{'' if count==1 else i+1}"
-            pool = df[df["position"].isin(["RB","WR","TE"])] if pos=="FLEX" else df[df["position"]==pos]
-            if positions:
-                pool = pool[pool["position"].isin(positions)]
-            if teams:
-                pool = pool[pool["team"].isin(teams)]
-            if opponents:
-                pool = pool[pool["opponent"].isin(opponents)]
-            pool = pool[~pool["name"].isin(used_players)]
-            options = ["--"] + [f"{r['name']} | ${r['salary']} | {r['fppg']} FPPG" for _, r in pool.iterrows()]
-            choice = st.selectbox(f"Select {label}", options, key=f"{label}_{username}")
-            if choice != "--":
-                name = choice.split(" | ")[0]
-                player_row = df[df["name"]==name].iloc[0].to_dict()
-                lineup[label] = player_row
-                used_players.append(name)
-            elif label in lineup:
-                del lineup[label]
+# Running salary total, adjusted per slot change instead of re-summed each rerun
+if "lineup_total" not in st.session_state:
+    st.session_state["lineup_total"] = sum(p["salary"] for p in lineup.values())
+
+@st.fragment
+def lineup_builder(base, username):
+    """Slot pickers + lineup summary; interactions rerun only this fragment"""
+    lineup = st.session_state["lineup"]
+
+    # Group the filtered players by position once, then look up each slot's pool
+    pos_groups = dict(tuple(base.groupby("position", sort=False, observed=True)))
+    pools = {
+        pos: base[base["position"].isin(FLEX_POSITIONS)] if pos=="FLEX" else pos_groups.get(pos, base.iloc[:0])
+        for pos in LINEUP_SLOTS
+    }
+
+    # Players picked in any slot; each slot excludes all but its own pick
+    used_players = {p["name"] for p in lineup.values()}
+    # Picks only rerun this fragment when the form is submitted
+    with st.form("lineup_form", clear_on_submit=False):
+        for pos, count in LINEUP_SLOTS.items():
+            for i in range(count):
+                label = f"{pos}{'' if count==1 else i+1}"
+                current = lineup.get(label, {}).get("name")
+                pool = pools[pos]
+                pool = pool[~pool["name"].isin(used_players - {current})]
+                options = ["--"] + pool["_label"].tolist()
+                choice = st.selectbox(f"Select {label}", options, key=f"{label}_{username}")
+                if choice != "--":
+                    player_row = player_by_label[choice]
+                    name = player_row["name"]
+                    if player_row != lineup.get(label):
+                        st.session_state["lineup_total"] += player_row["salary"] - lineup.get(label, {}).get("salary", 0)
+                        lineup[label] = player_row
+                        used_players.discard(current)
+                        used_players.add(name)
+                elif label in lineup:
+                    st.session_state["lineup_total"] -= lineup[label]["salary"]
+                    used_players.discard(current)
+                    del lineup[label]
+        st.form_submit_button("Update lineup")
 
     if lineup:
-        lineup_df = pd.DataFrame.from_dict(lineup, orient="index")
-        total_salary = lineup_df["salary"].sum()
+        total_salary = st.session_state["lineup_total"]
         remaining = SALARY_CAP - total_salary
         st.subheader("Your Lineup")
-        st.dataframe(lineup_df)
+        st.dataframe(pd.DataFrame.from_dict(lineup, orient="index"))
         st.markdown(f"**Total Salary:** ${total_salary:,}")
         st.markdown(f"**Remaining Salary:** ${remaining:,}")
 
@@ -208,50 +491,99 @@ else:
             if st.button("Save Lineup"):
                 df_row = {"manager": username, "week": current_week_key}
                 df_row.update({k: v["name"] for k, v in lineup.items()})
-                leaderboard_df = pd.concat([leaderboard_df, pd.DataFrame([df_row])], ignore_index=True)
-                write_sheet(leaderboard_ws, leaderboard_df)
-                st.success("Lineup saved! Refresh to view leaderboard.")
+                # Fresh read: fragment reruns reuse the leaderboard frame from the last full run
+                save_lineup(LEADERBOARD_SHEET, load_sheet(LEADERBOARD_SHEET), df_row)
+                st.session_state["lineup_saved"] = True
+                # Full-page rerun so the saved lineup replaces the builder
+                st.rerun(scope="app")
         with col2:
             if st.button("Reset Lineup"):
                 st.session_state["lineup"] = {}
-                st.experimental_rerun()
+                st.session_state["lineup_total"] = 0
+                st.rerun()
+
+if st.session_state.pop("lineup_saved", False):
+    st.success("Lineup saved!")
+if submitted_lineup:
+    st.info("You have already submitted a lineup. You cannot change it.")
+    st.dataframe(pd.DataFrame([submitted_lineup]))
+else:
+    lineup_builder(df.iloc[np.flatnonzero(filter_mask)], username)
 
 # ----------------------------
 # Weekly leaderboard with live points
 # ----------------------------
 st.subheader("🏆 Weekly Leaderboard")
-week_number = int(current_week_key.split("_week_")[1])
-weekly_display = []
-
-for idx, row in leaderboard_df[leaderboard_df['week']==current_week_key].iterrows():
-    total_points = 0
-    row_display = {"Manager": row['manager']}
-    for slot in LINEUP_SLOTS:
-        player_name = row.get(slot, "")
-        player_id = mapping.get(player_name)
-        points = get_player_points(player_id, SEASON_YEAR, week_number) if player_id else 0
-        row_display[slot] = f"{player_name} ({points} FPPG)" if player_name else ""
-        total_points += points
-    row_display["Total"] = total_points
-    weekly_display.append(row_display)
-
-st.dataframe(pd.DataFrame(weekly_display).sort_values(by="Total", ascending=False))
+
+# Refreshes on its own so live points update without rerunning the page
+@st.fragment(run_every=30)
+def weekly_leaderboard(week_key):
+    """Weekly lineups scored with live Sleeper points"""
+    week_number = int(week_key.split("_week_")[1])
+    leaderboard_df = load_sheet(LEADERBOARD_SHEET)
+    week_lineups = leaderboard_df[leaderboard_df['week']==week_key]
+
+    # Rows of a finished week that already carry their final scores need no fetch
+    stored = week_lineups.reindex(columns=SCORE_COLUMNS, fill_value="").apply(pd.to_numeric, errors="coerce")
+    stored.columns = SLOT_LABELS
+    unscored = week_lineups[stored.isna().any(axis=1)]
+
+    # Resolve each distinct player once, then fetch the distinct ids in parallel
+    # (the mapping is only loaded once there are lineups to score)
+    player_ids = {}
+    if not unscored.empty:
+        if not os.path.exists(MAPPING_FILE):
+            st.error(f"Mapping file not found: {MAPPING_FILE}")
+            st.stop()
+        player_id_by_name = get_mapping()
+        week_names = pd.unique(unscored.reindex(columns=SLOT_LABELS, fill_value="").values.ravel())
+        player_ids = {name: player_id_by_name.get(normalize_name(name)) for name in week_names if name}
+    points_map = get_points_map({pid for pid in player_ids.values() if pid is not None}, SEASON_YEAR, week_number)
+
+    # Long format: one row per (lineup, slot), then pivot back to one row per lineup
+    wl = week_lineups.reindex(columns=["manager"] + SLOT_LABELS, fill_value="").rename_axis("entry").reset_index()
+    wl = wl.melt(id_vars=["entry", "manager"], var_name="slot", value_name="name")
+    wl["name"] = wl["name"].fillna("")
+    wl["stored"] = stored.rename_axis("entry").reset_index().melt(id_vars="entry", var_name="slot")["value"]
+    wl["fetched"] = wl["name"].map(player_ids).map(points_map)
+    wl["points"] = wl["stored"].fillna(wl["fetched"]).fillna(0).astype(float)
+
+    # Once the week is final, persist the fetched scores. Only rows where every named slot
+    # was fetched are saved; unmapped names count as failed so a later mapping fix can still score them
+    if is_week_final(SEASON_YEAR, week_number) and not unscored.empty:
+        to_save = wl[wl["entry"].isin(unscored.index)]
+        failed = to_save.loc[(to_save["name"] != "") & to_save["fetched"].isna(), "entry"]
+        updates = {
+            entry: {f"{slot}_pts": pts for slot, pts in zip(rows["slot"], rows["points"])}
+            for entry, rows in to_save[~to_save["entry"].isin(failed)].groupby("entry")
+        }
+        if updates:
+            # Row positions come from a read up to 60s old: re-read, and only write rows
+            # that still hold the lineup that was scored
+            _fetch_sheets.clear()
+            fresh_df = load_sheet(LEADERBOARD_SHEET)
+            key_columns = ["manager", "week"] + SLOT_LABELS
+            scored = week_lineups.reindex(columns=key_columns, fill_value="").fillna("")
+            current = fresh_df.reindex(columns=key_columns, fill_value="").fillna("")
+            updates = {
+                entry: cells for entry, cells in updates.items()
+                if entry in current.index and current.loc[entry].tolist() == scored.loc[entry].tolist()
+            }
+            if updates:
+                write_cells(LEADERBOARD_SHEET, fresh_df, updates)
+    st.dataframe(build_weekly_df(wl[["entry", "slot", "name", "points"]], week_lineups["manager"]), hide_index=True, use_container_width=True)
+
+weekly_leaderboard(current_week_key)
 
 # ----------------------------
 # Season leaderboard
 # ----------------------------
 st.subheader("📊 Season Leaderboard")
-season_df = load_sheet(season_ws)
-# Add missing managers if needed
-for m in MANAGERS:
-    if m == "-":
-        continue
-    if m not in season_df['Manager'].values:
-        season_df = pd.concat([season_df, pd.DataFrame([{"Manager": m, "weeks_1st": 0, "weeks_2nd": 0, "weeks_3rd": 0, "total_points": 0}])], ignore_index=True)
-
-season_df["Placement Points"] = season_df["weeks_1st"]*10 + season_df["weeks_2nd"]*6 + season_df["weeks_3rd"]*3
-season_df = season_df.sort_values(by="Placement Points", ascending=False)
-st.dataframe(season_df)
-
-# Save season sheet
-write_sheet(season_ws, season_df)
+
+loaded_season_df = load_sheet(SEASON_SHEET)
+season_df = build_season_df(loaded_season_df)
+st.dataframe(season_df, hide_index=True, use_container_width=True)
+
+# Save season sheet (only when it changed, so the read cache stays warm)
+if not season_df.reset_index(drop=True).equals(loaded_season_df):
+    write_sheet(SEASON_SHEET, season_df)